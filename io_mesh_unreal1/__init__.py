@@ -1,9 +1,10 @@
 from struct import pack, calcsize
 from time import strftime
 from shutil import rmtree
+from concurrent.futures import ThreadPoolExecutor
 import os
+import numpy as np
 import bpy
-import bmesh
 import bpy_extras
 from bpy_extras.io_utils import (
         ImportHelper,
@@ -30,91 +31,104 @@ bl_info = {
 CONST_EXPORT_FORMAT_UNREAL1 = "UNREAL1"
 CONST_EXPORT_FORMAT_DEUSEX = "DEUSEX"
 
+# buffer size of the written files (the default 8 KiB causes many small writes)
+CONST_FILE_BUFFER_SIZE = 1 << 20
+
+# per-axis factors from unreal units to the fixed point values stored in the aniv file
+CONST_ENC_SCALE_UNREAL1 = (8.0, 8.0, 4.0)
+CONST_ENC_SCALE_DEUSEX = (256.0, 256.0, 256.0)
+
+# polygon record of the data file:
+# 3xH (unsigned short) 2xb (char) 6xB (unsigned char) 2xb (char)
+CONST_D3D_POLY_DTYPE = np.dtype([
+    ('vert_indices', '<u2', 3),
+    ('type', 'i1'),
+    ('color', 'i1'),
+    ('uvs', 'u1', 6),
+    ('mat_idx', 'i1'),
+    ('flags', 'i1'),
+    ])
+
+# data file header after NumPolygons and NumVertices, always zero:
+# 2xH (unsigned short) 7xI (unsigned long, 4-Bytes) 12xB (unsigned char)
+CONST_D3D_HEADER_TAIL = pack("=2H7I12B", *([0] * 21))
+
+
+# pass a timestamp to reuse it for many lines instead of formatting the time for each
+def log(file_, logging, print_it=False, timestamp=None):
+    if None == timestamp:
+        timestamp = strftime("%I:%M:%S")
 
-def log(file_, logging, print_it=False):
     if print_it:
-        print("[{}] {}".format(strftime("%I:%M:%S"), logging))
+        print("[{}] {}".format(timestamp, logging))
 
-    return file_.write("[{}] {}\n".format(strftime("%I:%M:%S"), logging))
+    return file_.write("[{}] {}\n".format(timestamp, logging))
 
 def ensure_dir(dirpath):
     # make sure directory exists (if not, create it)
-    if not os.path.isdir(dirpath):
-        os.makedirs(dirpath)      
+    os.makedirs(dirpath, exist_ok=True)
     print("Dir ensured: " + dirpath)
 
 def check_mesh(mesh_obj, scale):
     # take export-scale into account
     maxv = 128 / scale
+    verts = mesh_obj.data.vertices
+    if 0 == len(verts):
+        return True
+    # read all vertex coordinates in one go
+    coords = np.empty(len(verts) * 3, dtype=np.float32)
+    verts.foreach_get("co", coords)
+    coords = np.abs(coords.reshape(-1, 3))
     # make sure all vertices are in valid range
-    for i, v in enumerate(mesh_obj.data.vertices):
-        if -maxv >= v.co[0] or maxv <= v.co[0]:
-            print("Vertex ({}) x-position is out of bounds: {} (max +/-128 units)".format(i, v.co))
-            return False
-        if -maxv >= v.co[1] or maxv <= v.co[1]:
-            print("Vertex ({}) y-position is out of bounds: {} (max +/-128 units)".format(i, v.co))
-            return False
-        if -maxv >= v.co[2] or maxv <= v.co[2]:
-            print("Vertex ({}) z-position is out of bounds: {} (max +/-128 units)".format(i, v.co))
-            return False
-    return True
-
-# as unsigned long
+    if coords.max() < maxv:
+        return True
+    # report the first offending vertex
+    i, axis = divmod(int(np.argmax((coords >= maxv).ravel())), 3)
+    print("Vertex ({}) {}-position is out of bounds: {} (max +/-128 units)".format(i, "xyz"[axis], verts[i].co))
+    return False
+
+# encodes an (N, 3) array of coordinates already multiplied by CONST_ENC_SCALE_UNREAL1,
+# as unsigned long (4-Bytes) each
 # Important: raw coordinate values may never extend +/- 128
-def enc_vert_unreal(coord):
-    return int(
-            ( int(coord[0] * 8.0) & int("0x7ff", 16) ) | 
-          ( ( int(coord[1] * 8.0) & int("0x7ff", 16) ) << 11 ) |
-          ( ( int(coord[2] * 4.0) & int("0x3ff", 16) ) << 22 ) )
-
-# as unsigned long 
+def enc_verts_unreal(coords_fixed):
+    # truncate towards zero (same as int())
+    ci = coords_fixed.astype(np.int64)
+    return (  ( ci[:, 0] & 0x7ff ) |
+            ( ( ci[:, 1] & 0x7ff ) << 11 ) |
+            ( ( ci[:, 2] & 0x3ff ) << 22 ) ).astype(np.uint32)
+
+# encodes an (N, 3) array of coordinates already multiplied by CONST_ENC_SCALE_DEUSEX,
+# as unsigned long long (8-Bytes) each
 # Important: raw coordinate values may never extend +/- 128
-def enc_vert_deusex(coord):
-    return int(
-            ( int(coord[0] * 256.0) & int("0xffff", 16) ) | 
-          ( ( int(coord[1] * 256.0) & int("0xffff", 16) ) << 16 ) |
-          ( ( int(coord[2] * 256.0) & int("0xffff", 16) ) << 32 ) )
-
-def get_bmesh_snapshot(meshobj_org, flip_x, flip_y, flip_z):
-    # https://docs.blender.org/api/blender2.8/bpy.types.Depsgraph.html
-    # evaluate dependency graph of selected object
-    depsgraph = bpy.context.evaluated_depsgraph_get()
+def enc_verts_deusex(coords_fixed):
+    # truncate towards zero (same as int())
+    ci = coords_fixed.astype(np.int64)
+    return (  ( ci[:, 0] & 0xffff ) |
+            ( ( ci[:, 1] & 0xffff ) << 16 ) |
+            ( ( ci[:, 2] & 0xffff ) << 32 ) ).astype(np.uint64)
+
+# encodes (F, N, 3) coordinates of F frames into (F, N) values,
+# split into frame chunks encoded on all cores (NumPy releases the GIL while working on the arrays)
+def enc_frames(frames_coords, coords_mul, enc_verts):
+    frame_count, vert_count = frames_coords.shape[:2]
+    chunk_size = -(-frame_count // (os.cpu_count() or 1))
+
+    def enc_chunk(frame_idx):
+        chunk = frames_coords[frame_idx:frame_idx + chunk_size]
+        return enc_verts((chunk * coords_mul).reshape(-1, 3)).reshape(len(chunk), vert_count)
+
+    with ThreadPoolExecutor() as executor:
+        return np.concatenate(list(executor.map(enc_chunk, range(0, frame_count, chunk_size))))
+
+# https://docs.blender.org/api/blender2.8/bpy.types.Depsgraph.html
+# the depsgraph is re-evaluated by frame_set, so it can be fetched once and reused for every frame
+def get_mesh_eval(meshobj_org, depsgraph):
     # get object with dependency graph applied
     meshobj_eval = meshobj_org.evaluated_get(depsgraph)
+    return meshobj_eval.data
 
-    # Get a BMesh representation from evaluated mesh
-    bm = bmesh.new()
-    bm.from_mesh(meshobj_eval.data)
-
-    # triangulated bmesh: always make sure the mesh is triangulated or the exporter will fail
-    bmesh.ops.triangulate(bm, faces=bm.faces[:], quad_method='SHORT_EDGE', ngon_method='BEAUTY')
-    
-    if True == flip_x:
-        for v in bm.verts:
-            v.co.x *= -1
-        bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
-    if True == flip_y:
-        for v in bm.verts:
-            v.co.y *= -1
-        bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
-    if True == flip_z:
-        for v in bm.verts:
-            v.co.z *= -1
-        bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
-
-    return bm   
-
-def clear_bmesh_snapshot(bmesh_obj):
-    bmesh_obj.free()
-
-def get_jmesh_type(meshobj_org, mat_idx):
-    if 0 > mat_idx or len(meshobj_org.material_slots) <= mat_idx:
-        return 0 # default
-
-    material = meshobj_org.material_slots[mat_idx]
-    # print ("Material Name: {}".format(material.name))
-
-    mat_name = material.name.lower()
+# mat_name: material name, already lowered
+def get_jmesh_type(mat_name):
     #  DeusEx:
     #   0  "SKIN" (Normal)
     if '(skin)' in mat_name: return 0
@@ -136,6 +150,18 @@ def get_jmesh_type(meshobj_org, mat_idx):
     print ("Unknown material identifier in material name: {}".format(mat_name))
     return 0
 
+def get_jmesh_types(meshobj_org, mat_indices):
+    # resolve the type once per material slot,
+    # the extra last entry is the default for invalid material indices
+    mat_names = [slot.name.lower() for slot in meshobj_org.material_slots]
+    slot_count = len(mat_names)
+    jmesh_types = np.zeros(slot_count + 1, dtype=np.int8)
+    for mat_idx, mat_name in enumerate(mat_names):
+        jmesh_types[mat_idx] = get_jmesh_type(mat_name)
+
+    mat_indices_invalid = (0 > mat_indices) | (slot_count <= mat_indices)
+    return jmesh_types[np.where(mat_indices_invalid, slot_count, mat_indices)]
+
 # sets the current frame
 def set_frame(f):
     bpy.context.scene.frame_set(f)
@@ -156,7 +182,7 @@ class UnrealMeshExport(Operator):
     #properties definition
     p_path_export: bpy.props.StringProperty(
         name="Export Path", 
-        description="The path to your Unreal Engine 1 game (without a backslash in the end!).", 
+        description="The path to your Unreal Engine 1 game.", 
         default="C:\\UnrealTournament",
         subtype="DIR_PATH", 
         )
@@ -210,12 +236,19 @@ class UnrealMeshExport(Operator):
                 (CONST_EXPORT_FORMAT_DEUSEX, "DeusEx", "This is for DeusEx")
             ],
         )
+    p_log_verbose: bpy.props.BoolProperty(
+        name="Verbose Log", 
+        description="Write every vertex and polygon to the log file (slow)",
+        default=False, 
+        )
 
     def execute(self, context):
 
         # prepare vars ---------------------------
         mesh_obj = context.object
         frame_initial = get_frame()
+        # evaluated dependency graph of the scene
+        depsgraph = context.evaluated_depsgraph_get()
         frame_exp_start = bpy.context.scene.frame_start
         frame_exp_end = bpy.context.scene.frame_end
         frames_exp_count = frame_exp_end - frame_exp_start + 1
@@ -232,6 +265,7 @@ class UnrealMeshExport(Operator):
         flip_uv_u = self.p_flip_uv_u
         flip_uv_v = self.p_flip_uv_v
         export_format_type = self.p_export_format_type
+        log_verbose = self.p_log_verbose
 
         # checks ---------------------------
         if 0 >= frames_exp_count:
@@ -250,15 +284,20 @@ class UnrealMeshExport(Operator):
         print("Export Path: {}".format(path_export))
 
         # prepare directories ---------------------------
-        ensure_dir(path_export + "\\{}\\".format(package_name))
-        ensure_dir(path_export + "\\{}\\Models\\".format(package_name))
-        ensure_dir(path_export + "\\{}\\Help\\".format(package_name))
-        ensure_dir(path_export + "\\{}\\Skins\\".format(package_name))
-        ensure_dir(path_export + "\\{}\\Classes\\".format(package_name))
+        path_package = os.path.join(path_export, package_name)
+        path_models = os.path.join(path_package, "Models")
+        path_help = os.path.join(path_package, "Help")
+        path_skins = os.path.join(path_package, "Skins")
+        path_classes = os.path.join(path_package, "Classes")
+        # (also creates the package directory)
+        ensure_dir(path_models)
+        ensure_dir(path_help)
+        ensure_dir(path_skins)
+        ensure_dir(path_classes)
 
 
         # write log file: log.txt
-        with open(path_export + "\\{}\\Help\\log.txt".format(package_name), "w") as log_file:
+        with open(os.path.join(path_help, "log.txt"), "w", buffering=CONST_FILE_BUFFER_SIZE) as log_file:
             log(log_file, "Start Export:", True)
             log(log_file, "  Package Name: {}".format(package_name))
             log(log_file, "  Export Path: {}".format(path_export))
@@ -267,48 +306,37 @@ class UnrealMeshExport(Operator):
             # --------------------------------------------------
             # write vertex animation file: _a.3d
             log(log_file, "Writing aniv file ##################################", True)
-            with open(path_export + "\\{}\\Models\\{}_a.3d".format(package_name, mesh_name), "wb") as Aniv_File:
+            with open(os.path.join(path_models, "{}_a.3d".format(mesh_name)), "wb", buffering=CONST_FILE_BUFFER_SIZE) as Aniv_File:
                 # write Aniv_File header:
                 log(log_file, "  Writing aniv file header:", True)
                
                 vert_data_type = 'L'
+                enc_scale = CONST_ENC_SCALE_UNREAL1
+                enc_verts = enc_verts_unreal
                 if CONST_EXPORT_FORMAT_DEUSEX == export_format_type:
                     vert_data_type = 'Q'
+                    enc_scale = CONST_ENC_SCALE_DEUSEX
+                    enc_verts = enc_verts_deusex
                 
-                log(log_file, "    vert_data_type: {} size: {}".format(vert_data_type, calcsize(vert_data_type)), True)
+                log(log_file, "    vert_data_type: {} size: {}".format(vert_data_type, calcsize('=' + vert_data_type)), True)
 
                 # write number of frames (as short 2-Bytes)
                 Aniv_File.write(pack("=h", frames_exp_count))
-                # write framesize (data size per frame: vertex count * single vertex data size (==unsigned long 8-Bytes)) (as short 2-Bytes)
-                Aniv_File.write(pack("=h", len(mesh_obj.data.vertices) * calcsize(vert_data_type)))
+                # write framesize (data size per frame: vertex count * single vertex data size (unsigned long 4-Bytes / unsigned long long 8-Bytes)) (as short 2-Bytes)
+                Aniv_File.write(pack("=h", len(mesh_obj.data.vertices) * calcsize('=' + vert_data_type)))
                
                 log(log_file, "  Writing aniv file body!", True)
                 # set frame-pos to start frame
                 set_frame(frame_exp_start)
-                
+
+                # only vertex positions change between frames, so no triangulated mesh is needed here:
+                # just collect the evaluated coordinates of every frame
+                # (frame_set and the dependency graph must stay on the main thread)
+                frames_coords = np.empty((frames_exp_count, len(get_mesh_eval(mesh_obj, depsgraph).vertices) * 3), dtype=np.float32)
+
                 # for every frame ...
                 while get_frame() <= frame_exp_end:
-                    log(log_file, u"    Frame {} :".format(get_frame()))
-
-                    # prepare export mesh snapshot
-                    to_exp_bmesh_snap_f = get_bmesh_snapshot(mesh_obj, flip_model_x, flip_model_y, flip_model_z)
-
-                    # for every vertex ...
-                    for i, v in enumerate(to_exp_bmesh_snap_f.verts):
-                        # get vertex coordinate and apply scale from property
-                        vert_coord = [a * mesh_scale for a in v.co]
-                        # encode vertex coordinate into a single value
-                        vert_coord_encoded = 0
-                        if CONST_EXPORT_FORMAT_DEUSEX == export_format_type:
-                            vert_coord_encoded = enc_vert_deusex(vert_coord)
-                        else:
-                            vert_coord_encoded = enc_vert_unreal(vert_coord)
-                        log(log_file, u"      Vertex {} Position: raw=({},{},{}) -> encoded=({})".format(i, vert_coord[0], vert_coord[1], vert_coord[2], vert_coord_encoded))
-                        # write encoded vertex coordinate (as unsigned long 8-Bytes)
-                        Aniv_File.write(pack('=' + vert_data_type, vert_coord_encoded))
-
-                    # clear mesh snapshot
-                    clear_bmesh_snapshot(to_exp_bmesh_snap_f)
+                    get_mesh_eval(mesh_obj, depsgraph).vertices.foreach_get("co", frames_coords[get_frame() - frame_exp_start])
 
                     # advance frame-pos by one frame
                     advance_frame()
@@ -316,101 +344,136 @@ class UnrealMeshExport(Operator):
                 # reset frame-pos to initial position
                 set_frame(frame_initial)
 
+                # flip, apply scale from property and encoding in one step
+                # (all factors are exact in float64, so the result is the same as applying them one by one)
+                vert_coords_mul = np.array([
+                    -1.0 if True == flip_model_x else 1.0,
+                    -1.0 if True == flip_model_y else 1.0,
+                    -1.0 if True == flip_model_z else 1.0,
+                    ]) * mesh_scale * enc_scale
+                frames_coords = frames_coords.reshape(frames_exp_count, -1, 3)
+                # encode every vertex coordinate of every frame into a single value
+                frames_encoded = enc_frames(frames_coords, vert_coords_mul, enc_verts)
+
+                for frame_idx, vert_coords_encoded in enumerate(frames_encoded):
+                    log_time = strftime("%I:%M:%S")
+                    log(log_file, u"    Frame {} :".format(frame_exp_start + frame_idx), timestamp=log_time)
+
+                    if True == log_verbose:
+                        vert_coords = frames_coords[frame_idx] * (vert_coords_mul / enc_scale)
+                        for i, (vert_coord, vert_coord_encoded) in enumerate(zip(vert_coords, vert_coords_encoded)):
+                            log(log_file, u"      Vertex {} Position: raw=({},{},{}) -> encoded=({})".format(i, vert_coord[0], vert_coord[1], vert_coord[2], vert_coord_encoded), timestamp=log_time)
+
+                # write all encoded vertex coordinates of all frames at once
+                frames_encoded.tofile(Aniv_File)
+
 
 
             # --------------------------------------------------
             # write mesh data file: _d.3d
             log(log_file, "Writing data file ##################################", True)
-            with open(path_export + "\\{}\\Models\\{}_d.3d".format(package_name, mesh_name), "wb") as Data_File:
+            with open(os.path.join(path_models, "{}_d.3d".format(mesh_name)), "wb", buffering=CONST_FILE_BUFFER_SIZE) as Data_File:
                 
                 log(log_file, "  Writing data file header:", True)
                 
-                 # prepare export mesh snapshot
-                to_exp_bmesh_snap = get_bmesh_snapshot(mesh_obj, flip_model_x, flip_model_y, flip_model_z)
-                
+                # prepare export mesh: temporary copy of the evaluated mesh
+                mesh_obj_eval = mesh_obj.evaluated_get(depsgraph)
+                to_exp_mesh = mesh_obj_eval.to_mesh()
+                # triangulated: always make sure the mesh is triangulated or the exporter will fail
+                to_exp_mesh.calc_loop_triangles()
+
+                poly_count = len(to_exp_mesh.loop_triangles)
+
                 # write header:
                 # unsigned short  NumPolygons;  2       - write
                 # unsigned short  NumVertices;  2       - write
                 # unsigned short  BogusRot;     2       - fill
                 # unsigned short  BogusFrame;   2       - fill
-                # unsigned long   BogusNormX;   8       - fill
-                # unsigned long   BogusNormY;   8       - fill
-                # unsigned long   BogusNormZ;   8       - fill
-                # unsigned long   FixScale;     8       - fill
-                # unsigned long   Unused[3];    3x8     - fill
+                # unsigned long   BogusNormX;   4       - fill
+                # unsigned long   BogusNormY;   4       - fill
+                # unsigned long   BogusNormZ;   4       - fill
+                # unsigned long   FixScale;     4       - fill
+                # unsigned long   Unused[3];    3x4     - fill
                 # unsigned char   Unknown[12];  12x1    - fill
-                # 4xH (unsigned short) 7xL (unsigned long) 12xB (unsigned char)
-                Data_File.write(pack("4H7L12B", len(to_exp_bmesh_snap.faces), len(to_exp_bmesh_snap.verts), *([0] * 21)))
+                # 2xH (unsigned short) + CONST_D3D_HEADER_TAIL
+                Data_File.write(pack("=2H", poly_count, len(to_exp_mesh.vertices)) + CONST_D3D_HEADER_TAIL)
                 
                 log(log_file, "  Writing data file body:", True)
 
-                uv_chan_count = len(to_exp_bmesh_snap.loops.layers.uv)
-
-                # write faces (must be triangles)
-                for i, poly in enumerate(to_exp_bmesh_snap.faces):                   
-                    
-                    if 3 != len(poly.verts):
-                        self.report({'ERROR'}, "Error: only triangles are allowed")
-                        return {'CANCELLED'}
-
-                    # UVs: get uv coordinates (3) from the face's vertices (also 3)
-                    uvs = []
-                    for loop in poly.loops:
-                        uv = (0, 0)
-                        if 0 < uv_chan_count:
-                            uv = loop[to_exp_bmesh_snap.loops.layers.uv[0]].uv
-                        # restrict to 0-1 range
-                        uv[0] = uv[0] % 1
-                        uv[1] = uv[1] % 1
-                        # flip in u- and v-direction
-                        if True == flip_uv_u:
-                            uv[0] = 1 - uv[0]
-                        if True == flip_uv_v:
-                            uv[1] = 1 - uv[1]
-                        # scale from 0-1 to 0-255 range
-                        uv[0] = uv[0] * 255
-                        uv[1] = uv[1] * 255
-                        # append to list
-                        uvs.append(int(uv[0]))
-                        uvs.append(int(uv[1]))
-
-                    # write poly data:
-                    # Vertex indices                        - unsigned short [3]
-                    face_vert_indices = [vert.index for vert in poly.verts]
-                    # James' mesh type                      - char
-                    #  DeusEx:
-                    #   0  "SKIN" (Normal)
-                    #   1  "TWOSIDEDNORM"
-                    #   2  "TRANSLUCENT"
-                    #   3  "TWOSIDED"
-                    #   8  "WEAPON"
-                    #   16 "UNLIT"
-                    #   32 "FLAT"
-                    #   64 "ENVMAPPED"
-                    face_type = get_jmesh_type(mesh_obj, poly.material_index)
-                    # Color for flat and Gouraud shaded     - char
-                    face_color = 0
-                    # Texture UV coordinates                - unsigned char [3][2]
-                    face_uvs = uvs
-                    # Source texture offset                 - char
-                    face_mat_idx= poly.material_index + 1
-                    # Unreal mesh flags (currently unused)  - char
-                    face_flags = 0
-                    # 3xH (unsigned short) 2xb (char) 6xB (unsigned char) 2xb (char)
-                    print("*face_vert_indices {}, face_type {}, face_color {}, *face_uvs {}, face_mat_idx {}, face_flags {}".format(face_vert_indices, face_type, face_color, face_uvs, face_mat_idx, face_flags))
-                    Data_File.write(pack("3H2b6B2b", *face_vert_indices, face_type, face_color, *face_uvs, face_mat_idx, face_flags))
-
-                    log(log_file, "    Polygone {} vertex_indices=({}, {}, {})".format(i, *face_vert_indices))
-
-                # clear snapshot
-                clear_bmesh_snapshot(to_exp_bmesh_snap)
+                # loop and vertex indices of every triangle's 3 corners: (poly_count, 3)
+                poly_loops = np.empty(poly_count * 3, dtype=np.int32)
+                to_exp_mesh.loop_triangles.foreach_get("loops", poly_loops)
+                poly_loops = poly_loops.reshape(-1, 3)
+
+                poly_vert_indices = np.empty(poly_count * 3, dtype=np.int32)
+                to_exp_mesh.loop_triangles.foreach_get("vertices", poly_vert_indices)
+                poly_vert_indices = poly_vert_indices.reshape(-1, 3)
+
+                poly_mat_indices = np.empty(poly_count, dtype=np.int32)
+                to_exp_mesh.loop_triangles.foreach_get("material_index", poly_mat_indices)
+
+                # flipping the model on an axis inverts the winding of its faces,
+                # so only an odd number of flips changes it (two flips cancel out)
+                if 1 == [flip_model_x, flip_model_y, flip_model_z].count(True) % 2:
+                    poly_loops = poly_loops[:, ::-1]
+                    poly_vert_indices = poly_vert_indices[:, ::-1]
+
+                # UVs: get uv coordinates (3) from the face's vertices (also 3)
+                loop_uvs = np.zeros(len(to_exp_mesh.loops) * 2, dtype=np.float32)
+                if 0 < len(to_exp_mesh.uv_layers):
+                    to_exp_mesh.uv_layers[0].data.foreach_get("uv", loop_uvs)
+                # (kept in float32: the uv vectors store float32, so every step below was rounded to float32 before too)
+                uvs = loop_uvs.reshape(-1, 2)[poly_loops]
+                # restrict to 0-1 range
+                uvs %= 1.0
+                # flip in u- and v-direction
+                if True == flip_uv_u:
+                    uvs[..., 0] = 1 - uvs[..., 0]
+                if True == flip_uv_v:
+                    uvs[..., 1] = 1 - uvs[..., 1]
+                # scale from 0-1 to 0-255 range
+                uvs *= 255
+
+                # clear temporary mesh
+                mesh_obj_eval.to_mesh_clear()
+
+                # write poly data (all at once):
+                polys = np.zeros(poly_count, dtype=CONST_D3D_POLY_DTYPE)
+                # Vertex indices                        - unsigned short [3]
+                polys['vert_indices'] = poly_vert_indices
+                # James' mesh type                      - char
+                #  DeusEx:
+                #   0  "SKIN" (Normal)
+                #   1  "TWOSIDEDNORM"
+                #   2  "TRANSLUCENT"
+                #   3  "TWOSIDED"
+                #   8  "WEAPON"
+                #   16 "UNLIT"
+                #   32 "FLAT"
+                #   64 "ENVMAPPED"
+                polys['type'] = get_jmesh_types(mesh_obj, poly_mat_indices)
+                # Color for flat and Gouraud shaded     - char
+                polys['color'] = 0
+                # Texture UV coordinates                - unsigned char [3][2]
+                polys['uvs'] = uvs.reshape(-1, 6).astype(np.uint8)
+                # Source texture offset                 - char
+                polys['mat_idx'] = poly_mat_indices + 1
+                # Unreal mesh flags (currently unused)  - char
+                polys['flags'] = 0
+
+                if True == log_verbose:
+                    log_time = strftime("%I:%M:%S")
+                    for i, face_vert_indices in enumerate(polys['vert_indices']):
+                        log(log_file, "    Polygone {} vertex_indices=({}, {}, {})".format(i, *face_vert_indices), timestamp=log_time)
+
+                polys.tofile(Data_File)
 
 
 
             # --------------------------------------------------
             # write unreal class file: .uc
             log(log_file, "Writing class file ##################################", True)
-            with open(path_export + "\\{}\\Classes\\{}.uc".format(package_name, class_name), "w") as Class_File:
+            with open(os.path.join(path_classes, "{}.uc".format(class_name)), "w") as Class_File:
                 Class_File.write("#exec MESH IMPORT MESH={0} ANIVFILE=Models\{0}_a.3d DATAFILE=Models\{0}_d.3d X=0 Y=0 Z=0 unmirror=1\n".format(mesh_name))
                 Class_File.write("#exec MESH ORIGIN MESH={} X=0 Y=0 Z=0 ROLL=0\n\n".format(mesh_name))
 